@@ -3,7 +3,6 @@ from collections.abc import Iterator
 from typing import NoReturn
 import os
 
-from click.testing import CliRunner
 import pytest
 
 from .utils import SubprocessMocker
@@ -21,12 +20,8 @@ if os.getenv('_PYTEST_RAISE', '0') != '0':  # pragma no cover
 
 
 @pytest.fixture()
-def runner() -> CliRunner:
-    return CliRunner()
-
-
-@pytest.fixture()
-def sp_mocker() -> Iterator[SubprocessMocker]:
+def sp_mocker(monkeypatch: pytest.MonkeyPatch) -> Iterator[SubprocessMocker]:
     m = SubprocessMocker()
+    monkeypatch.setattr('upkeep.utils.sp.run', m.get_output)
     yield m
     m.reset_output()
@@ -1,21 +1,43 @@
 # SPDX-License-Identifier: MIT
-from click.testing import CliRunner
+from pathlib import Path
+
 from pytest_mock import MockFixture
 
 from upkeep.commands import ecleans_command as ecleans
 from upkeep.commands.ecleans import ECLEANS_COMMANDS
 
-from .utils import SubprocessMocker
+from .utils import SubprocessMocker, invoke_nocap
 
 
-def test_ecleans_exception(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
+def test_ecleans_exception(sp_mocker: SubprocessMocker) -> None:
     sp_mocker.add_output4(('emerge', '--depclean', '--quiet'), raise_=True, check=True)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(ecleans).exit_code != 0
+    assert invoke_nocap(ecleans) != 0
+
+
+def test_ecleans(sp_mocker: SubprocessMocker, mocker: MockFixture, tmp_path: Path) -> None:
+    (tmp_path / 'sys-apps').mkdir()
+    (tmp_path / 'sys-apps' / 'build.log').write_text('')
+    (tmp_path / '.keep').write_text('')
+    for command in ECLEANS_COMMANDS:
+        sp_mocker.add_output4(command, check=True)
+    mocker.patch('upkeep.commands.ecleans.PORTAGE_TMPDIR', str(tmp_path))
+    assert invoke_nocap(ecleans) == 0
+    assert not any(tmp_path.iterdir())
+
+
+def test_ecleans_no_portage_tmpdir(sp_mocker: SubprocessMocker, mocker: MockFixture,
+                                   tmp_path: Path) -> None:
+    for command in ECLEANS_COMMANDS:
+        sp_mocker.add_output4(command, check=True)
+    mocker.patch('upkeep.commands.ecleans.PORTAGE_TMPDIR', str(tmp_path / 'missing'))
+    assert invoke_nocap(ecleans) == 0
 
 
-def test_ecleans(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
+def test_ecleans_portage_tmpdir_unlink_error(sp_mocker: SubprocessMocker, mocker: MockFixture,
+                                             tmp_path: Path) -> None:
+    (tmp_path / '.keep').write_text('')
     for command in ECLEANS_COMMANDS:
         sp_mocker.add_output4(command, check=True)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(ecleans).exit_code == 0
+    mocker.patch('upkeep.commands.ecleans.PORTAGE_TMPDIR', str(tmp_path))
+    mocker.patch('upkeep.commands.ecleans.unlink', side_effect=PermissionError)
+    assert invoke_nocap(ecleans) == 0
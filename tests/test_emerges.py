@@ -1,110 +1,73 @@
 # SPDX-License-Identifier: MIT
-import subprocess as sp
-import sys
+from multiprocessing import cpu_count
 
-from click.testing import CliRunner
 from pytest_mock import MockFixture
+import pytest
 
 from upkeep.commands import emerges_command as emerges
 
-from .utils import SubprocessMocker
+from .utils import SubprocessMocker, invoke_nocap
 
+Argv = tuple[str, ...]
+CPU_COUNT = cpu_count()
+EMERGE_JOBS_ARGS = (f'--jobs={CPU_COUNT}', f'--load-average={CPU_COUNT + 1.0}')
+EMERGE_LIVE_REBUILD = ('emerge', '--keep-going', '--quiet', '--usepkg=n', '@live-rebuild',
+                       *EMERGE_JOBS_ARGS)
+EMERGE_PORTAGE = ('emerge', '--oneshot', '--update', 'portage', '--quiet')
+EMERGE_PRESERVED_REBUILD = ('emerge', '--keep-going', '--quiet', '--usepkg=n', '@preserved-rebuild',
+                            *EMERGE_JOBS_ARGS)
+EMERGE_WORLD = ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world',
+                '--quiet', *EMERGE_JOBS_ARGS)
+SYSTEMCTL_DAEMON_REEXEC = ('systemctl', 'daemon-reexec')
 
-def test_emerges_keyboard_interrupt(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sp_mocker.add_output4(['emerge', '--oneshot', '--update', 'portage', '--quiet'],
-                          raise_=True,
-                          check=True)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges).exit_code != 0
 
+def test_emerges_keyboard_interrupt(sp_mocker: SubprocessMocker) -> None:
+    sp_mocker.add_output4(EMERGE_PORTAGE, raise_=True, check=True)
+    assert invoke_nocap(emerges) != 0
 
-def test_emerges_live_rebuild(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sp_mocker.add_output4(['emerge', '--oneshot', '--update', 'portage', '--quiet'], check=True)
-    sp_mocker.add_output4(
-        ['emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world', '--quiet'],
-        check=True)
-    sp_mocker.add_output4(['emerge', '--keep-going', '--quiet', '--usepkg=n', '@live-rebuild'],
-                          check=True)
-    sp_mocker.add_output4(['emerge', '--keep-going', '--quiet', '--usepkg=n', '@preserved-rebuild'],
-                          check=True)
-    sp_mocker.add_output4(['bash', '-c', 'command -v systemctl'],
-                          check=True,
-                          stdout=sp.DEVNULL,
-                          stderr=sp.DEVNULL)
-    sp_mocker.add_output4(['systemctl', 'daemon-reexec'], check=True)
-    sp_mocker.add_output3(['eselect', '--colour=no', 'kernel', 'list'], stdout_output='')
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges).exit_code == 0
-    assert ('emerge --keep-going --quiet --usepkg=n @live-rebuild') in sp_mocker.history
 
+@pytest.fixture()
+def emerges_sp_mocker(sp_mocker: SubprocessMocker) -> SubprocessMocker:
+    for args in (EMERGE_PORTAGE, EMERGE_WORLD, EMERGE_LIVE_REBUILD, EMERGE_PRESERVED_REBUILD,
+                 SYSTEMCTL_DAEMON_REEXEC):
+        sp_mocker.add_output4(args, check=True)
+    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'), stdout_output='')
+    return sp_mocker
 
-def test_emerges_preserved_rebuild(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sys.argv = ['emerges', '--no-live-rebuild', '--no-daemon-reexec', '--no-upgrade-kernel']
-    sp_mocker.add_output4(('emerge', '--oneshot', '--update', 'portage', '--quiet'), check=True)
-    sp_mocker.add_output4(
-        ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world', '--quiet'),
-        check=True)
-    sp_mocker.add_output4(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@preserved-rebuild'),
-                          check=True)
-    sp_mocker.add_output4(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@live-rebuild'),
-                          check=True)
-    sp_mocker.add_output4(('bash', '-c', 'command -v systemctl'),
-                          check=True,
-                          stderr=sp.DEVNULL,
-                          stdout=sp.DEVNULL)
-    sp_mocker.add_output4(('systemctl', 'daemon-reexec'), check=True)
-    sp_mocker.add_output3(['eselect', '--colour=no', 'kernel', 'list'], stdout_output='')
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges).exit_code == 0
-    assert ('emerge --keep-going --quiet --usepkg=n @preserved-rebuild') in sp_mocker.history
 
+@pytest.mark.parametrize(
+    ('args', 'systemctl', 'expected', 'unexpected'),
+    [((), '/usr/bin/systemctl',
+      (EMERGE_LIVE_REBUILD, EMERGE_PRESERVED_REBUILD, SYSTEMCTL_DAEMON_REEXEC), ()),
+     (('--no-live-rebuild', '--no-daemon-reexec', '--no-upgrade-kernel'), '/usr/bin/systemctl',
+      (EMERGE_PRESERVED_REBUILD,), (EMERGE_LIVE_REBUILD, SYSTEMCTL_DAEMON_REEXEC)),
+     (('--no-live-rebuild', '--no-preserved-rebuild', '--no-upgrade-kernel'), '/usr/bin/systemctl',
+      (SYSTEMCTL_DAEMON_REEXEC,), (EMERGE_LIVE_REBUILD, EMERGE_PRESERVED_REBUILD)),
+     (('--no-live-rebuild', '--no-preserved-rebuild', '--no-upgrade-kernel'), None, (),
+      (SYSTEMCTL_DAEMON_REEXEC,))])
+def test_emerges_steps(emerges_sp_mocker: SubprocessMocker, mocker: MockFixture, args: Argv,
+                       systemctl: str | None, expected: tuple[Argv, ...],
+                       unexpected: tuple[Argv, ...]) -> None:
+    mocker.patch('upkeep.commands.emerges.which', return_value=systemctl)
+    assert invoke_nocap(emerges, args) == 0
+    for command in expected:
+        assert command in emerges_sp_mocker.history
+    for command in unexpected:
+        assert command not in emerges_sp_mocker.history
 
-def test_emerges_daemon_reexec(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sys.argv = ['emerges', '--no-live-rebuild', '--no-preserved-rebuild', '--no-upgrade-kernel']
-    sp_mocker.add_output4(('emerge', '--oneshot', '--update', 'portage', '--quiet'), check=True)
-    sp_mocker.add_output4(
-        ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world', '--quiet'),
-        check=True)
-    sp_mocker.add_output4(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@live-rebuild'),
-                          check=True)
-    sp_mocker.add_output4(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@preserved-rebuild'),
-                          check=True)
-    sp_mocker.add_output4(('bash', '-c', 'command -v systemctl'),
-                          check=True,
-                          stderr=sp.DEVNULL,
-                          stdout=sp.DEVNULL)
-    sp_mocker.add_output4(('systemctl', 'daemon-reexec'), check=True)
-    sp_mocker.add_output3(['eselect', '--colour=no', 'kernel', 'list'], stdout_output='')
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges).exit_code == 0
-    assert 'systemctl daemon-reexec' in sp_mocker.history
 
-
-def test_emerges_daemon_reexec_no_systemd(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sys.argv = ['emerges', '--no-live-rebuild', '--no-preserved-rebuild', '--no-upgrade-kernel']
-    sp_mocker.add_output4(('emerge', '--oneshot', '--update', 'portage', '--quiet'), check=True)
-    sp_mocker.add_output4(
-        ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world', '--quiet'),
-        check=True)
-    sp_mocker.add_output4(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@live-rebuild'),
-                          check=True)
-    sp_mocker.add_output4(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@preserved-rebuild'),
-                          check=True)
-    sp_mocker.add_output4(('bash', '-c', 'command -v systemctl'),
-                          raise_=True,
-                          check=True,
-                          stdout=sp.DEVNULL,
-                          stderr=sp.DEVNULL)
-    sp_mocker.add_output3(['eselect', '--colour=no', 'kernel', 'list'], stdout_output='')
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    result = CliRunner().invoke(emerges)
-    assert result.exit_code == 0
-    assert 'systemctl daemon-reexec' not in sp_mocker.history
-
-
-def test_emerges(mocker: MockFixture, runner: CliRunner) -> None:
+def test_emerges(mocker: MockFixture) -> None:
     mocker.patch('upkeep.commands.emerges.CommandRunner')
     upgrade_kernel = mocker.patch('upkeep.commands.emerges.upgrade_kernel')
-    result = runner.invoke(emerges, ('--no-upgrade-kernel'))
-    assert result.exit_code == 0
+    assert invoke_nocap(emerges, ('--no-upgrade-kernel',)) == 0
     assert upgrade_kernel.call_count == 0
+
+
+@pytest.mark.parametrize(('environ', 'expected'), [({}, '-j4 -l9.0'), ({'MAKEOPTS': '-j1'}, '-j1')])
+def test_emerges_makeopts(mocker: MockFixture, environ: dict[str, str], expected: str) -> None:
+    command_runner = mocker.patch('upkeep.commands.emerges.CommandRunner')
+    mocker.patch('upkeep.commands.emerges.cpu_count', return_value=8)
+    mocker.patch('upkeep.commands.emerges.minenv', return_value=environ)
+    assert invoke_nocap(emerges, ('--no-upgrade-kernel', '--jobs', '2', '--load-average', '9')) == 0
+    world_call = command_runner.return_value.check_call.call_args_list[1]
+    assert world_call.kwargs['env']['MAKEOPTS'] == expected
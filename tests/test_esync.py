@@ -1,47 +1,38 @@
 # SPDX-License-Identifier: MIT
-from click.testing import CliRunner
 from pytest_mock import MockFixture
 
 from upkeep.commands import esync_command as esync
 
-from .utils import SubprocessMocker
+from .utils import SubprocessMocker, invoke_nocap
 
 
 def test_esync_no_eix(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sp_mocker.add_output3(('bash', '-c', 'command -v eix-sync'), raise_=True, stdout=-1)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(esync).exit_code != 0
+    mocker.patch('upkeep.commands.esync.which', return_value=None)
+    assert invoke_nocap(esync) != 0
 
 
 def test_esync_no_layman(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sp_mocker.add_output3(('bash', '-c', 'command -v eix-sync'), stdout=-1)
     sp_mocker.add_output3(('eix-sync', '-a', '-q', '-H'), stdout=None, raise_=True)
-    sp_mocker.add_output3(('bash', '-c', 'command -v layman'), raise_=True, stdout=-1)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(esync, ['-l']).exit_code != 0
+    mocker.patch('upkeep.commands.esync.which',
+                 side_effect=lambda name: None if name == 'layman' else f'/usr/bin/{name}')
+    assert invoke_nocap(esync, ['-l']) != 0
 
 
 def test_esync_layman(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
     sp_mocker.add_output3(('eix-sync', '-a', '-q', '-H'), stdout=None)
-    sp_mocker.add_output3(('bash', '-c', 'command -v eix-sync'), stdout=-1)
-    sp_mocker.add_output3(('bash', '-c', 'command -v layman'), stdout=-1)
+    mocker.patch('upkeep.commands.esync.which', side_effect=lambda name: f'/usr/bin/{name}')
     sp_mocker.add_output3(('layman', '-S'), stdout=None)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(esync, ['-l']).exit_code == 0
+    assert invoke_nocap(esync, ['-l']) == 0
 
 
 def test_esync_layman_fail(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
     sp_mocker.add_output3(('eix-sync', '-a', '-q', '-H'), stdout=None)
-    sp_mocker.add_output3(('bash', '-c', 'command -v eix-sync'), stdout=-1)
-    sp_mocker.add_output3(('bash', '-c', 'command -v layman'), stdout=-1)
+    mocker.patch('upkeep.commands.esync.which', side_effect=lambda name: f'/usr/bin/{name}')
     sp_mocker.add_output3(('layman', '-S'), stdout=None, raise_=True)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(esync, ['-l']).exit_code != 0
+    assert invoke_nocap(esync, ['-l']) != 0
 
 
-def test_esync_eix_sync_failure(sp_mocker: SubprocessMocker, mocker: MockFixture,
-                                runner: CliRunner) -> None:
-    sp_mocker.add_output3(('bash', '-c', 'command -v eix-sync'), stdout=-1)
+def test_esync_eix_sync_failure(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
+    mocker.patch('upkeep.commands.esync.which', side_effect=lambda name: f'/usr/bin/{name}')
     sp_mocker.add_output3(('eix-sync', '-a', '-q', '-H'), stdout=None, raise_=True)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert runner.invoke(esync).exit_code != 0
+    assert invoke_nocap(esync) != 0
@@ -1,11 +1,16 @@
 # SPDX-License-Identifier: MIT
+from collections.abc import Callable
 from inspect import isfunction
 
-from click.testing import CliRunner
+from pytest_mock import MockFixture
 import click
+import pytest
 
 from upkeep.commands.kernel import kernel_command
 from upkeep.decorators import umask
+from upkeep.utils import which
+
+from .utils import invoke_nocap
 
 
 def test_umask_with_function() -> None:
@@ -14,12 +19,19 @@ def test_umask_with_function() -> None:
     assert umasker() is None
 
 
-def test_kernel_command() -> None:
-    assert CliRunner().invoke(kernel_command(lambda x: None)).exit_code == 0
+def _raise_abort(_x: int | None) -> None:
+    raise click.Abort
+
 
+@pytest.mark.parametrize(('func', 'succeeds'), [(lambda _x: None, True), (_raise_abort, False)])
+def test_kernel_command(func: Callable[[int | None], None], succeeds: bool) -> None:
+    assert (invoke_nocap(kernel_command(func)) == 0) is succeeds
 
-def test_kernel_command_raise() -> None:
-    def raise_(_x: int | None) -> None:
-        raise click.Abort
 
-    assert CliRunner().invoke(kernel_command(raise_)).exit_code != 0
+def test_which_is_cached(mocker: MockFixture) -> None:
+    shutil_which = mocker.patch('upkeep.utils.shutil.which', return_value='/usr/bin/eix-sync')
+    which.cache_clear()
+    assert which('eix-sync') == '/usr/bin/eix-sync'
+    assert which('eix-sync') == '/usr/bin/eix-sync'
+    assert shutil_which.call_count == 1
+    which.cache_clear()
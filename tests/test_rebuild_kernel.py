@@ -1,39 +1,69 @@
 # SPDX-License-Identifier: MIT
-from click.testing import CliRunner
-from pytest_mock.plugin import MockerFixture as MockFixture
+from pathlib import Path
+from unittest.mock import MagicMock
+import os
+
+from pytest_mock import MockFixture
 import pytest
 
 from upkeep.commands.kernel import kernel_command
 from upkeep.constants import CONFIG_GZ
 from upkeep.exceptions import KernelError
-from upkeep.utils.kernel import rebuild_kernel
+from upkeep.utils.kernel import _config_is_current, rebuild_kernel
 
+from .utils import invoke_nocap
 
-def test_rebuild_kernel_no_config_yes_gz(mocker: MockFixture) -> None:
-    class FakePath:
-        def __init__(self, s: str):
-            self.s = s
+_FAKE_PATHS = {
+    '.config': MagicMock(spec=Path, **{'is_file.return_value': False}),
+    CONFIG_GZ: MagicMock(spec=Path, **{'is_file.return_value': True})
+}
 
-        def is_file(self) -> bool:
-            if self.s == '.config':
-                return False
-            if self.s == CONFIG_GZ:
-                return True
-            raise Exception(self.s)  # noqa: TRY002
 
-    mocker.patch('upkeep.utils.kernel.Path', new=FakePath)
-    mocker.patch('upkeep.utils.kernel.chdir')
+def test_rebuild_kernel_no_config_yes_gz(mocker: MockFixture,
+                                         monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr('upkeep.utils.kernel.Path', _FAKE_PATHS.__getitem__)
+    monkeypatch.setattr('upkeep.utils.kernel.chdir', lambda _path: None)
     open_f = mocker.patch('upkeep.utils.kernel.open')
     gzip_open = mocker.patch('upkeep.utils.kernel.gzip.open')
+    gzip_open.return_value.__enter__.return_value.read.side_effect = (b'CONFIG_X=y\n', b'')
     with pytest.raises(KernelError):
         rebuild_kernel(1)
     assert gzip_open.call_count == 1
     assert open_f.call_count == 1
+    open_f.return_value.__enter__.return_value.write.assert_called_once_with(b'CONFIG_X=y\n')
 
 
-def test_kernel_command_raises_abort(mocker: MockFixture, runner: CliRunner) -> None:
+def test_kernel_command_raises_abort(mocker: MockFixture) -> None:
     def raise_(x: int | None) -> None:
         raise KernelError
 
-    res = runner.invoke(kernel_command(raise_))
-    assert res.return_value != 0
+    assert invoke_nocap(kernel_command(raise_)) != 0
+
+
+def _make_tree(root: Path, *, config: float, auto_conf: float | None, kconfig: float) -> None:
+    (root / 'include' / 'config').mkdir(parents=True)
+    (root / 'arch' / 'x86').mkdir(parents=True)
+    (root / '.config').write_text('')
+    os.utime(root / '.config', (config, config))
+    (root / 'arch' / 'x86' / 'Kconfig.debug').write_text('')
+    os.utime(root / 'arch' / 'x86' / 'Kconfig.debug', (kconfig, kconfig))
+    if auto_conf is not None:
+        (root / 'include' / 'config' / 'auto.conf').write_text('')
+        os.utime(root / 'include' / 'config' / 'auto.conf', (auto_conf, auto_conf))
+
+
+@pytest.mark.parametrize(('auto_conf', 'kconfig', 'expected'), [(None, 1, False), (3, 1, True),
+                                                                (1, 1, False), (3, 4, False)])
+def test_config_is_current(tmp_path: Path, monkeypatch: pytest.MonkeyPatch, auto_conf: float | None,
+                           kconfig: float, expected: bool) -> None:
+    _make_tree(tmp_path, config=2, auto_conf=auto_conf, kconfig=kconfig)
+    monkeypatch.chdir(tmp_path)
+    assert _config_is_current() is expected
+
+
+def test_config_is_current_dangling_kconfig(tmp_path: Path,
+                                            monkeypatch: pytest.MonkeyPatch) -> None:
+    _make_tree(tmp_path, config=2, auto_conf=3, kconfig=1)
+    (tmp_path / 'Kconfig').symlink_to(tmp_path / 'missing')
+    monkeypatch.chdir(tmp_path)
+    assert _config_is_current() is False
@@ -1,265 +1,216 @@
 # SPDX-License-Identifier: MIT
-from collections.abc import Callable
+from functools import cache
 from multiprocessing import cpu_count
 from subprocess import CalledProcessError
 from types import TracebackType
-from typing import Any, TypeVar
+from typing import Any, NamedTuple, NoReturn
+from unittest.mock import MagicMock
 import subprocess as sp
 
-from click.testing import CliRunner
-from pytest_mock.plugin import MockerFixture as MockFixture
+from pytest_mock import MockFixture
 import click
 import pytest
 
 from upkeep.commands import emerges_command as emerges
-from upkeep.constants import OLD_KERNELS_DIR
 from upkeep.exceptions import KernelConfigMissing
 from upkeep.utils.kernel import upgrade_kernel
 
-from .utils import SubprocessMocker
-
-T = TypeVar('T')
-
-
-def method_return(return_value: T) -> Callable[[], T]:
-    def cb() -> T:
-        return return_value
-
-    return cb
-
-
-def method_return1(return_value: T) -> Callable[[Any, Any], T]:
-    def cb(self: Any, x: Any) -> T:
-        return return_value
-
-    return cb
-
-
-def test_upgrade_kernel_no_eselect_output(sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sp_mocker.add_output(('eselect', '--colour=no', 'kernel', 'list'),
-                         stdout_output='',
-                         check=True,
-                         stdout=sp.PIPE)
-    sp_mocker.add_output(
-        ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world', '--quiet'),
-        check=True)
-    sp_mocker.add_output(['emerge', '--oneshot', '--update', 'portage', '--quiet'], check=True)
-    sp_mocker.add_output(['emerge', '--keep-going', '--quiet', '@live-rebuild'], check=True)
-    sp_mocker.add_output(['emerge', '--keep-going', '--quiet', '@preserved-rebuild'], check=True)
-    sp_mocker.add_output(['bash', '-c', 'command -v systemctl'],
-                         check=True,
-                         stdout=sp.DEVNULL,
-                         stderr=sp.DEVNULL)
-    sp_mocker.add_output(['systemctl', 'daemon-reexec'], check=True, stdout=None, stderr=None)
-    mocker.patch('upkeep.utils.kernel.Path').return_value.glob = method_return1(['.'])
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges,
-                              ('--no-live-rebuild', '--no-preserved-rebuild', '--no-daemon-reexec',
-                               '--fatal-upgrade-kernel')).exit_code != 0
-
-
-def test_upgrade_kernel_eselect_too_many_kernels(sp_mocker: SubprocessMocker,
-                                                 mocker: MockFixture) -> None:
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'), stdout_output=' *\n \n')
-    sp_mocker.add_output(
-        ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world', '--quiet'),
-        check=True)
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' \n \n \n')
-    sp_mocker.add_output(['emerge', '--oneshot', '--update', 'portage', '--quiet'], check=True)
-    mocker.patch('upkeep.utils.kernel.Path').return_value.glob = method_return1(['/etc/profile'])
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges,
-                              ('--no-live-rebuild', '--no-preserved-rebuild', '--no-daemon-reexec',
-                               '--fatal-upgrade-kernel')).exit_code != 0
-
-
-def test_upgrade_kernel_eselect_kernel_set_invalid_output_from_eselect(
-        sp_mocker: SubprocessMocker, mocker: MockFixture) -> None:
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
-                          stdout_output=' [3] *\n [4] \n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' *\n \n')
-    mocker.patch('upkeep.utils.kernel.Path').return_value.glob = method_return1(['/etc/profile'])
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    assert CliRunner().invoke(emerges,
-                              ('emerges', '--no-live-rebuild', '--no-preserved-rebuild',
-                               '--no-daemon-reexec', '--fatal-upgrade-kernel')).exit_code != 0
-
-
-def test_upgrade_kernel_rebuild_no_config(mocker: MockFixture, sp_mocker: SubprocessMocker) -> None:
-    mocker.patch('upkeep.utils.kernel.Path').return_value.glob = method_return1(['/etc/profile'])
-    mocker.patch('upkeep.utils.kernel.chdir')
-    mocker.patch('upkeep.utils.kernel.Path').return_value.is_file = method_return(False)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
+from .utils import SubprocessMocker, invoke_nocap
+
+CPU_COUNT = cpu_count()
+EMERGE_JOBS_ARGS = (f'--jobs={CPU_COUNT}', f'--load-average={CPU_COUNT + 1.0}')
+EMERGE_MODULE_REBUILD = ('emerge', '--keep-going', f'--jobs={max(1, CPU_COUNT // 2)}',
+                         '@module-rebuild', '@x11-module-rebuild')
+EMERGE_PORTAGE = ('emerge', '--oneshot', '--update', 'portage', '--quiet')
+EMERGE_WORLD = ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world',
+                '--quiet', *EMERGE_JOBS_ARGS)
+EMERGES_UPGRADE_KERNEL_ONLY = ('--no-live-rebuild', '--no-preserved-rebuild', '--no-daemon-reexec',
+                               '--fatal-upgrade-kernel')
+ESELECT_KERNEL_LIST = ('eselect', '--colour=no', 'kernel', 'list')
+ESELECT_KERNEL_SET_2 = ('eselect', 'kernel', 'set', '2')
+MAKE_BUILD = ('make', f'-j{CPU_COUNT}', f'-l{CPU_COUNT + 1}')
+MAKE_INSTALL = ('make', 'install')
+MAKE_MODULES_INSTALL = ('make', 'modules_install')
+MAKE_OLDCONFIG = ('make', 'oldconfig')
+
+
+class KernelPatches(NamedTuple):
+    config_is_current: MagicMock
+    open: MagicMock
+    path: MagicMock
+
+
+@pytest.fixture(autouse=True)
+def kernel_patches(mocker: MockFixture, monkeypatch: pytest.MonkeyPatch) -> KernelPatches:
+    monkeypatch.setattr('upkeep.utils.kernel.chdir', lambda _path: None)
+    return KernelPatches(config_is_current=mocker.patch('upkeep.utils.kernel._config_is_current',
+                                                        return_value=False),
+                         open=mocker.patch('upkeep.utils.kernel.open'),
+                         path=mocker.patch('upkeep.utils.kernel.Path'))
+
+
+class FakeFile:
+    __slots__ = ('content',)
+
+    def __init__(self, content: bytes = b''):
+        self.content = content
+
+    def read(self, _count: int | None = None) -> bytes:
+        return self.content
+
+    def write(self, _value: Any) -> None:
+        pass
+
+    def readlines(self) -> list[Any]:
+        return []
+
+    def __enter__(self) -> 'FakeFile':
+        return self
+
+    def __exit__(self, _a: type[BaseException] | None, _b: BaseException | None,
+                 _c: TracebackType | None) -> None:
+        pass
+
+
+EMPTY_FILE = FakeFile()
+MZ_FILE = FakeFile(b'MZ')
+
+
+class PathMock:
+    __slots__ = ('name',)
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def glob(self, _glob_str: str) -> list['PathMock']:
+        if self.name == '/boot':
+            return [PathMock('mz-file'), PathMock('not-mz-file')]
+        if self.name == '/etc/dracut.conf.d':
+            return [PathMock('/etc/dracut.conf.d/main.conf')]
+        return []
+
+    def open(self, _mode: str) -> FakeFile:
+        return MZ_FILE if self.name == 'mz-file' else EMPTY_FILE
+
+    def mkdir(self, *args: Any, **kwargs: Any) -> None:
+        pass
+
+    def exists(self) -> bool:
+        return False
+
+    def unlink(self) -> None:
+        pass
+
+    def joinpath(self, *args: Any) -> 'PathMock':
+        return self
+
+    def is_file(self) -> bool:
+        return True
+
+    def __str__(self) -> str:
+        return self.name
+
+
+@pytest.fixture()
+def path_mock(kernel_patches: KernelPatches) -> type[PathMock]:
+    kernel_patches.path.side_effect = cache(PathMock)
+    return PathMock
+
+
+@pytest.mark.parametrize('eselect_stdout', ['', ' [1] *\n [2] \n [3] \n', ' [3] *\n [4] \n'],
+                         ids=['no-output', 'too-many-kernels', 'kernel-set-fails'])
+def test_upgrade_kernel_eselect_bad_output(sp_mocker: SubprocessMocker,
+                                           eselect_stdout: str) -> None:
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST, stdout_output=eselect_stdout)
+    sp_mocker.add_output3(('eselect', 'kernel', 'set', '4'),
+                          stdout=sp.DEVNULL,
+                          stderr=sp.DEVNULL,
+                          raise_=True)
+    sp_mocker.add_output(EMERGE_WORLD, check=True)
+    sp_mocker.add_output(EMERGE_PORTAGE, check=True)
+    assert invoke_nocap(emerges, EMERGES_UPGRADE_KERNEL_ONLY) != 0
+
+
+def test_upgrade_kernel_rebuild_no_config(kernel_patches: KernelPatches,
+                                          sp_mocker: SubprocessMocker) -> None:
+    kernel_patches.path.return_value.is_file.return_value = False
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST,
                           stdout_output=' [1] *\n [2] \n',
                           stderr=None,
                           stdout=sp.PIPE)
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' *\n \n')
-    sp_mocker.add_output3(('eselect', 'kernel', 'set', '2'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
+    sp_mocker.add_output3(ESELECT_KERNEL_SET_2, stdout=sp.DEVNULL, stderr=sp.DEVNULL)
     with pytest.raises(click.Abort):
         upgrade_kernel()
 
 
-def test_upgrade_kernel_rebuild_error_during_build(mocker: MockFixture,
+def test_upgrade_kernel_rebuild_error_during_build(kernel_patches: KernelPatches,
                                                    sp_mocker: SubprocessMocker) -> None:
-    mocker.patch('upkeep.utils.kernel.Path').return_value.glob = method_return1(['/etc/profile'])
-    mocker.patch('upkeep.utils.kernel.chdir')
-    mocker.patch('upkeep.utils.kernel.open')
-    mocker.patch('upkeep.utils.kernel.Path').return_value.is_file = method_return(True)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
-                          stdout_output=' [1] *\n [2] linux-5.6.14-gentoo\n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' [1] linux-5.6.14-gentoo *\n \n')
-    sp_mocker.add_output3(('bootctl', '-p'), stdout_output='/efi')
-    sp_mocker.add_output3(('dracut', '--force', '--kver', '5.6.14-gentoo'), raise_=True)
-    sp_mocker.add_output3(('eselect', 'kernel', 'set', '2'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('make', 'oldconfig'), stdout=None)
-    sp_mocker.add_output3(('make', f'-j{cpu_count() + 1}'),
-                          stdout=sp.DEVNULL,
-                          stderr=sp.DEVNULL,
-                          raise_=True)
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
+    kernel_patches.path.return_value.is_file.return_value = True
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST, stdout_output=' [1] *\n [2] linux-5.6.14-gentoo\n')
+    sp_mocker.add_output3(ESELECT_KERNEL_SET_2, stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+    sp_mocker.add_output3(MAKE_OLDCONFIG, stdout=None)
+    sp_mocker.add_output3(MAKE_BUILD, stdout=sp.DEVNULL, stderr=sp.DEVNULL, raise_=True)
     with pytest.raises(CalledProcessError):
         upgrade_kernel()
 
 
-def test_upgrade_kernel_rebuild_systemd_boot_normal(mocker: MockFixture,
-                                                    sp_mocker: SubprocessMocker) -> None:
-    class FakeFile:
-        def __init__(self, content: bytes = b''):
-            self.content = content
-
-        def read(self, _count: int | None = None) -> bytes:
-            return self.content
-
-        def write(self, _value: Any) -> None:
-            pass
-
-        def readlines(self) -> list[Any]:
-            return []
-
-        def __enter__(self) -> 'FakeFile':
-            return self
-
-        def __exit__(self, _a: type[BaseException] | None, _b: BaseException | None,
-                     _c: TracebackType | None) -> None:
-            pass
-
-    class PathMock:
-        def __init__(self, name: str):
-            self.name = name
-
-        def glob(self, _glob_str: str) -> list['PathMock']:
-            if self.name == '/boot':
-                return [PathMock('mz-file'), PathMock('not-mz-file')]
-            if self.name == '/etc/dracut.conf.d':
-                return [PathMock('/etc/dracut.conf.d/main.conf')]
-            return []
-
-        def open(self, _mode: str) -> FakeFile:
-            if self.name == 'mz-file':
-                return FakeFile(b'MZ')
-            return FakeFile()
-
-        def mkdir(self, *args: Any, **kwargs: Any) -> None:
-            pass
-
-        def exists(self) -> bool:
-            return False
-
-        def unlink(self) -> None:
-            pass
-
-        def joinpath(self, *args: Any) -> 'PathMock':
-            return self
-
-        def is_file(self) -> bool:
-            return True
-
-        def __str__(self) -> str:
-            return self.name
-
-    mocker.patch('upkeep.utils.kernel.Path', new=PathMock)
-    mocker.patch('upkeep.utils.kernel.chdir')
-    mocker.patch('upkeep.utils.kernel.open')
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
-                          stdout_output=' [1] *\n [2] linux-5.6.6-gentoo\n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' *\n \n')
-    sp_mocker.add_output3(('eix', '--installed', '--exact', 'grub'), raise_=True)
-    sp_mocker.add_output3(('bootctl', '-p'), stdout_output='/boot/efi')
-    sp_mocker.add_output3(('bootctl', 'status'), stdout_output='')
-    sp_mocker.add_output3(('eselect', 'kernel', 'set', '2'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('make', 'oldconfig'), stdout=None)
-    sp_mocker.add_output3(('make', f'-j{cpu_count() + 1}'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('make', 'modules_install'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('emerge', '--keep-going', '@module-rebuild', '@x11-module-rebuild'),
-                          stdout=sp.DEVNULL,
-                          stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('find', '/boot', '-maxdepth', '1', '(', '-name', 'initramfs-*', '-o',
-                           '-name', 'vmlinuz-*', '-o', '-iname', 'System.map*', '-o', '-iname',
-                           'config-*', ')', '-exec', 'mv', '{}', OLD_KERNELS_DIR, ';'),
-                          stdout=sp.DEVNULL,
-                          stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('make', 'install'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    sp_mocker.add_output3(('eix', '--installed', '--exact', 'grub'), stdout=None)
-    sp_mocker.add_output3(('bootctl', 'update'), stdout=None, stderr=sp.PIPE)
-    sp_mocker.add_output3(('grep', '-E', '^uefi="(yes|true)"', '/etc/dracut.conf.d/main.conf'),
-                          stdout=sp.DEVNULL,
-                          stderr=sp.DEVNULL)
+@pytest.mark.usefixtures('path_mock')
+def test_upgrade_kernel_rebuild_systemd_boot_normal(sp_mocker: SubprocessMocker) -> None:
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST, stdout_output=' [1] *\n [2] linux-5.6.6-gentoo\n')
+    sp_mocker.add_output3(MAKE_OLDCONFIG, stdout=None)
+    sp_mocker.add_output3_many((ESELECT_KERNEL_SET_2, MAKE_BUILD, MAKE_MODULES_INSTALL,
+                                EMERGE_MODULE_REBUILD, MAKE_INSTALL),
+                               stdout=sp.DEVNULL,
+                               stderr=sp.DEVNULL)
     try:
         upgrade_kernel()
     except RuntimeError as e:
         pytest.fail(f'Unexpected RuntimeError: {e.args}')
 
 
+@pytest.mark.usefixtures('path_mock')
+def test_upgrade_kernel_rebuild_config_is_current(kernel_patches: KernelPatches,
+                                                  sp_mocker: SubprocessMocker) -> None:
+    kernel_patches.config_is_current.return_value = True
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST, stdout_output=' [1] *\n [2] linux-5.6.6-gentoo\n')
+    sp_mocker.add_output3_many((ESELECT_KERNEL_SET_2, MAKE_BUILD, MAKE_MODULES_INSTALL,
+                                EMERGE_MODULE_REBUILD, MAKE_INSTALL),
+                               stdout=sp.DEVNULL,
+                               stderr=sp.DEVNULL)
+    upgrade_kernel()
+    assert MAKE_OLDCONFIG not in sp_mocker.history
+    assert MAKE_BUILD in sp_mocker.history
+
+
 def test_upgrade_kernel_eselect_kernel_non_fatal(mocker: MockFixture,
                                                  sp_mocker: SubprocessMocker) -> None:
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
-                          stdout_output=' [1] *\n [2] linux-5.6.6-gentoo\n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' *\n \n \n')
+    sp_mocker.add_output3(
+        ESELECT_KERNEL_LIST,
+        stdout_output=' [1] *\n [2] linux-5.6.6-gentoo\n [3] linux-5.6.7-gentoo\n')
     abort = mocker.patch('upkeep.utils.kernel.click.Abort')
     upgrade_kernel(fatal=False)
     assert abort.call_count == 0
 
 
-def test_upgrade_kernel_no_config_non_fatal(mocker: MockFixture,
+def test_upgrade_kernel_no_config_non_fatal(mocker: MockFixture, monkeypatch: pytest.MonkeyPatch,
                                             sp_mocker: SubprocessMocker) -> None:
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
-                          stdout_output=' [1] *\n [2] \n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output=' *\n \n')
-    sp_mocker.add_output3(('eselect', 'kernel', 'set', '2'), stdout=sp.DEVNULL, stderr=sp.DEVNULL)
-    mocker.patch('upkeep.utils.kernel.rebuild_kernel', side_effect=KernelConfigMissing)
+    def rebuild_kernel(_num_cpus: int | None = None) -> NoReturn:
+        raise KernelConfigMissing
+
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST, stdout_output=' [1] *\n [2] \n')
+    sp_mocker.add_output3(ESELECT_KERNEL_SET_2, stdout=sp.DEVNULL, stderr=sp.DEVNULL)
+    monkeypatch.setattr('upkeep.utils.kernel.rebuild_kernel', rebuild_kernel)
     abort = mocker.patch('upkeep.utils.kernel.click.Abort')
     upgrade_kernel(fatal=False)
     assert abort.call_count == 0
 
 
-def test_upgrade_kernel_eselect_no_selection(mocker: MockFixture,
-                                             sp_mocker: SubprocessMocker) -> None:
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'), stdout_output='*\n\n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output='*\n\n')
-    with pytest.raises(click.Abort):
-        upgrade_kernel(fatal=False)
-
-
-def test_upgrade_kernel_eselect_no_selection2(mocker: MockFixture,
-                                              sp_mocker: SubprocessMocker) -> None:
-    mocker.patch('upkeep.utils.sp.run', new=sp_mocker.get_output)
-    sp_mocker.add_output3(('eselect', '--colour=no', 'kernel', 'list'),
-                          stdout_output='[abc] *\n [abc]\n')
-    sp_mocker.add_output3(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                          stdout_output='*\n\n')
+@pytest.mark.parametrize(
+    'eselect_stdout',
+    ['*\n\n', '[abc] *\n [abc]\n', ' [1] linux-5.6.6-gentoo\n [2] linux-5.6.7-gentoo *\n'],
+    ids=['no-selection', 'no-index', 'newer-kernel-selected'])
+def test_upgrade_kernel_eselect_no_kernel_to_upgrade_to(sp_mocker: SubprocessMocker,
+                                                        eselect_stdout: str) -> None:
+    sp_mocker.add_output3(ESELECT_KERNEL_LIST, stdout_output=eselect_stdout)
     with pytest.raises(click.Abort):
         upgrade_kernel(fatal=False)
@@ -1,33 +1,49 @@
 # SPDX-License-Identifier: MIT
-from collections.abc import Sequence
-from typing import TypedDict
-import json
+from collections.abc import Iterable, Sequence
+from typing import Any
 import subprocess as sp
 
 from Levenshtein import distance
-from typing_extensions import Unpack
+import click
 import pytest
 
-__all__ = ('SubprocessMocker',)
+__all__ = ('SubprocessMocker', 'invoke_nocap')
 
+_Key = tuple[tuple[str, ...], bool, int | None, int | None]
 
-class MakeKeyKwargsOptional(TypedDict, total=False):
-    check: bool
-    stderr: int | None
-    stdout: int | None
-    text: bool
 
+def _make_key(args: Sequence[str],
+              *,
+              check: bool = False,
+              stdout: int | None = None,
+              stderr: int | None = None) -> _Key:
+    return tuple(args), check, stdout, stderr
 
-class MakeKeyKwargs(MakeKeyKwargsOptional):
-    pass
 
+def _closest_key(key: _Key, existing_keys: Iterable[_Key]) -> tuple[_Key, int]:  # pragma: no cover
+    """
+    Find the registered key with the smallest edit distance to ``key``.
 
-def _make_key(args: Sequence[str], **kwargs: Unpack[MakeKeyKwargs]) -> str:
-    kwargs.pop('text', None)
-    return json.dumps({**kwargs, **dict(args=args)}, sort_keys=True)
+    The length difference is a lower bound on the distance, so candidates that cannot beat the best
+    match so far are skipped without computing it.
+    """
+    key_repr = repr(key)
+    it = iter(existing_keys)
+    best_key = next(it)
+    best = distance(repr(best_key), key_repr)
+    for existing_key in it:
+        existing_repr = repr(existing_key)
+        if abs(len(existing_repr) - len(key_repr)) >= best:
+            continue
+        dist = distance(existing_repr, key_repr, score_cutoff=best)
+        if dist < best:
+            best_key, best = existing_key, dist
+    return best_key, best
 
 
 class _FakeCompletedProcess:
+    __slots__ = ('returncode', 'stderr', 'stdout')
+
     def __init__(self,
                  stdout_output: str | None = None,
                  stderr_output: str | None = None,
@@ -37,35 +53,32 @@ class _FakeCompletedProcess:
         self.returncode = returncode
 
 
+_EMPTY_PROCESS = _FakeCompletedProcess()
+
+
 class SubprocessMocker:
+    __slots__ = ('_outputs', 'history')
+
     def __init__(self) -> None:
-        self._outputs: dict[str, _FakeCompletedProcess | BaseException] = {}
-        self.history: list[str] = []
-
-    def get_output(
-            self, args: Sequence[str], **kwargs: Unpack[MakeKeyKwargs]
-    ) -> _FakeCompletedProcess | sp.CalledProcessError | None:
-        self.history.append(' '.join(args))
-        key = _make_key(args,
-                        check=kwargs.get('check', False),
-                        stdout=kwargs.get('stdout', None),
-                        stderr=kwargs.get('stderr', None),
-                        text=kwargs.get('text', True))
+        self._outputs: dict[_Key, _FakeCompletedProcess | BaseException] = {}
+        self.history: set[tuple[str, ...]] = set()
+
+    def get_output(self,
+                   args: Sequence[str],
+                   *,
+                   check: bool = False,
+                   stdout: int | None = None,
+                   stderr: int | None = None,
+                   **_kwargs: Any) -> _FakeCompletedProcess | sp.CalledProcessError | None:
+        self.history.add(tuple(args))
+        key = _make_key(args, check=check, stdout=stdout, stderr=stderr)
         try:
             val = self._outputs[key]
         except KeyError:  # pragma: no cover
-            existing_keys = list(self._outputs.keys())
-            closest = '\n'
-            if existing_keys:
-                possible_keys: list[tuple[int, int]] = []
-                for i, existing_key in enumerate(self._outputs.keys()):
-                    possible_keys.append((distance(existing_key, key), i))
-                possible_keys = sorted(possible_keys)
-                closest += f'Closest match:\n{existing_keys[possible_keys[0][1]]}'
-                closest += f'\nDistance: {possible_keys[0][0]}'
-                pytest.fail(f'Failed to find key:\n{key}{closest}')
-            else:
+            if not self._outputs:
                 pytest.fail(f'Failed to find key:\n{key}. No keys were set!')
+            closest, dist = _closest_key(key, self._outputs)
+            pytest.fail(f'Failed to find key:\n{key}\nClosest match:\n{closest}\nDistance: {dist}')
         if isinstance(val, BaseException):
             raise val
         return val
@@ -83,11 +96,13 @@ class SubprocessMocker:
                    returncode: int = 0,
                    raise_: bool = False) -> None:
         key = _make_key(args, check=check, stderr=stderr, stdout=stdout)
-        if not raise_:
-            self._outputs[key] = _FakeCompletedProcess(stdout_output, stderr_output, returncode)
-        else:
+        if raise_:
             self._outputs[key] = sp.CalledProcessError(returncode or 255, args, stdout_output,
                                                        stderr_output)
+        elif stdout_output is None and stderr_output is None and returncode == 0:
+            self._outputs[key] = _EMPTY_PROCESS
+        else:
+            self._outputs[key] = _FakeCompletedProcess(stdout_output, stderr_output, returncode)
 
     def add_output3(self,
                     args: Sequence[str],
@@ -111,3 +126,32 @@ class SubprocessMocker:
                     stderr: int | None = None,
                     raise_: bool = False) -> None:
         self.add_output(args, raise_=raise_, stdout=stdout, stderr=stderr, check=check)
+
+    def add_output3_many(self,
+                         args_list: Iterable[Sequence[str]],
+                         stdout: int | None = sp.PIPE,
+                         stderr: int | None = None) -> None:
+        """Register several successful ``check=True`` commands sharing the same redirection."""
+        for args in args_list:
+            self.add_output3(args, stdout=stdout, stderr=stderr)
+
+
+def invoke_nocap(cmd: click.Command, args: Sequence[str] = ()) -> int:
+    """
+    Run a command the way :py:meth:`click.testing.CliRunner.invoke` would, minus output capture.
+
+    Returns the exit code. As with ``CliRunner``, uncaught exceptions result in ``1``.
+    """
+    try:
+        ret = cmd.main(list(args), standalone_mode=False)
+    except click.ClickException as e:
+        return e.exit_code
+    except click.Abort:
+        return 1
+    except SystemExit as e:
+        if e.code is None:
+            return 0
+        return e.code if isinstance(e.code, int) else 1
+    except Exception:  # noqa: BLE001
+        return 1
+    return ret if isinstance(ret, int) else 0
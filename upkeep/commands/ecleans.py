@@ -1,17 +1,30 @@
 # SPDX-License-Identifier: MIT
-from pathlib import Path
+from contextlib import suppress
+from os import scandir, unlink
+import shutil
 import subprocess as sp
 
 import click
 
+from ..constants import PORTAGE_TMPDIR
 from ..decorators import umask
 from ..utils import CommandRunner
 
 __all__ = ('ecleans',)
 ECLEANS_COMMANDS = (('emerge', '--depclean', '--quiet'),
                     ('emerge', '--quiet', '@preserved-rebuild'), ('revdep-rebuild', '--quiet'),
-                    ('eclean-dist', '--deep'), ('eclean-pkg', '--deep'),
-                    ['rm', '-fR'] + [str(s) for s in Path('/var/tmp/portage').glob('*')])
+                    ('eclean-dist', '--deep'), ('eclean-pkg', '--deep'))
+
+
+def _clean_portage_tmpdir() -> None:
+    """Removes everything under ``/var/tmp/portage`` without spawning ``rm``."""
+    with suppress(FileNotFoundError), scandir(PORTAGE_TMPDIR) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                with suppress(OSError):
+                    unlink(entry.path)  # noqa: PTH108
 
 
 @click.command('ecleans')
@@ -24,7 +37,7 @@ def ecleans() -> None:
     - ``emerge --usepkg=n --quiet @preserved-rebuild``
     - ``revdep-rebuild --quiet` -- --usepkg=n``
     - ``eclean-dist --deep``
-    - ``rm -fR /var/tmp/portage/*``
+    - ``rm -fR /var/tmp/portage/*`` (done in-process)
 
     Returns
     -------
@@ -37,3 +50,4 @@ def ecleans() -> None:
             runner.check_call(command)
     except sp.CalledProcessError as e:
         raise click.Abort from e
+    _clean_portage_tmpdir()
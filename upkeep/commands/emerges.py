@@ -1,13 +1,19 @@
 # SPDX-License-Identifier: MIT
+from contextlib import suppress
+from multiprocessing import cpu_count
 import subprocess as sp
 
 import click
 
 from ..constants import DEFAULT_USER_CONFIG
 from ..decorators import umask
-from ..utils import CommandRunner
+from ..utils import CommandRunner, minenv, which
 from .kernel import upgrade_kernel
 
+_EMERGE_PORTAGE = ('emerge', '--oneshot', '--update', 'portage')
+_EMERGE_REBUILD = ('emerge', '--keep-going', '--quiet', '--usepkg=n')
+_EMERGE_WORLD = ('emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world')
+
 
 @click.command('emerges')
 @click.option('--fatal-upgrade-kernel',
@@ -23,6 +29,16 @@ from .kernel import upgrade_kernel
               default=DEFAULT_USER_CONFIG,
               help='Override configuration file path.')
 @click.option('-e', '--exclude', metavar='ATOM')
+@click.option('-j',
+              '--jobs',
+              type=click.IntRange(min=1),
+              default=cpu_count(),
+              help='Number of packages emerge may build simultaneously')
+@click.option('-l',
+              '--load-average',
+              type=float,
+              default=cpu_count() + 1.0,
+              help='Do not start new emerge jobs when the load average is at least this value')
 @click.option('-v', '--verbose', is_flag=True, help='Pass --verbose to emerge and enable logging')
 @umask(new_umask=0o022)
 def emerges(ask: bool = False,
@@ -33,14 +49,18 @@ def emerges(ask: bool = False,
             config: str | None = None,
             fatal_upgrade_kernel: bool = False,
             verbose: bool = False,
-            exclude: str | None = None) -> None:
+            exclude: str | None = None,
+            jobs: int = cpu_count(),
+            load_average: float = cpu_count() + 1.0) -> None:
     """
     Runs the following steps:
 
     - ``emerge --oneshot --quiet --update portage``
-    - ``emerge --keep-going --tree --quiet --update --deep --newuse @world``
-    - ``emerge --usepkg=n --keep-going --quiet @live-rebuild``
-    - ``emerge --usepkg=n --keep-going --quiet @preserved-rebuild``
+    - ``emerge --keep-going --tree --quiet --update --deep --newuse @world --jobs=JOBS
+      --load-average=LOAD``
+    - ``emerge --usepkg=n --keep-going --quiet @live-rebuild --jobs=JOBS --load-average=LOAD``
+    - ``emerge --usepkg=n --keep-going --quiet @preserved-rebuild --jobs=JOBS
+      --load-average=LOAD``
     - ``systemctl daemon-reexec`` if applicable
     - upgrade kernel
 
@@ -52,6 +72,9 @@ def emerges(ask: bool = False,
       step
     - ``-D`` / ``--no-daemon-reexec``: Skip ``systemctl daemon-reexec`` step
     - ``-U`` / ``--no-upgrade-kernel``: Skip upgrading the kernel
+    - ``-j`` / ``--jobs``: Pass ``--jobs`` to the ``@world``, ``@live-rebuild`` and
+      ``@preserved-rebuild`` steps
+    - ``-l`` / ``--load-average``: Pass ``--load-average`` to the same steps
 
     See Also
     --------
@@ -61,32 +84,27 @@ def emerges(ask: bool = False,
     preserved_rebuild = not no_preserved_rebuild
     daemon_reexec = not no_daemon_reexec
     up_kernel = not no_upgrade_kernel
-    ask_arg = ['--ask'] if ask else []
-    verbose_arg = ['--verbose'] if verbose else ['--quiet']
-    exclude_arg = [f'--exclude={x}' for x in exclude or []]
+    ask_arg = ('--ask',) if ask else ()
+    verbose_arg = ('--verbose',) if verbose else ('--quiet',)
+    exclude_arg = tuple(f'--exclude={x}' for x in exclude or ())
+    jobs_arg = (f'--jobs={jobs}', f'--load-average={load_average}')
+    # Split the CPUs between emerge's jobs so that each package build does not also use all of them.
+    # Portage takes MAKEOPTS from the environment over make.conf. One set by the caller is kept.
+    emerge_env = dict(minenv())
+    emerge_env.setdefault('MAKEOPTS', f'-j{max(1, cpu_count() // jobs)} -l{load_average}')
     runner = CommandRunner()
     try:
-        runner.check_call(['emerge', '--oneshot', '--update', 'portage'] + verbose_arg)
-        runner.check_call(
-            ['emerge', '--keep-going', '--tree', '--update', '--deep', '--newuse', '@world'] +
-            ask_arg + verbose_arg + exclude_arg)
+        runner.check_call(_EMERGE_PORTAGE + verbose_arg)
+        runner.check_call(_EMERGE_WORLD + ask_arg + verbose_arg + exclude_arg + jobs_arg,
+                          env=emerge_env)
         if live_rebuild:
-            runner.check_call(('emerge', '--keep-going', '--quiet', '--usepkg=n', '@live-rebuild'))
+            runner.check_call((*_EMERGE_REBUILD, '@live-rebuild', *jobs_arg), env=emerge_env)
         if preserved_rebuild:
-            runner.check_call((
-                'emerge',
-                '--keep-going',
-                '--quiet',
-                '--usepkg=n',
-                '@preserved-rebuild',
-            ))
+            runner.check_call((*_EMERGE_REBUILD, '@preserved-rebuild', *jobs_arg), env=emerge_env)
     except sp.CalledProcessError as e:
         raise click.Abort from e
-    if daemon_reexec:
-        try:
-            runner.suppress_output(('bash', '-c', 'command -v systemctl'))
+    if daemon_reexec and which('systemctl'):
+        with suppress(sp.CalledProcessError):
             runner.check_call(('systemctl', 'daemon-reexec'))
-        except sp.CalledProcessError:
-            pass
     if up_kernel:
         upgrade_kernel(None, fatal=fatal_upgrade_kernel)
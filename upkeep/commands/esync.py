@@ -4,7 +4,7 @@ import subprocess as sp
 from loguru import logger
 import click
 
-from ..utils import CommandRunner
+from ..utils import CommandRunner, which
 
 __all__ = ('esync',)
 
@@ -24,20 +24,16 @@ def esync(debug: bool = False, run_layman: bool = False) -> None:
     """
     runner = CommandRunner()
     if run_layman:
-        try:
-            runner.run(('bash', '-c', 'command -v layman'), stdout=sp.PIPE)
-        except sp.CalledProcessError as e:
+        if not which('layman'):
             logger.error('You need to have app-portage/layman installed')
-            raise click.Abort from e
+            raise click.Abort
         try:
             runner.run(('layman', '-S'))
         except sp.CalledProcessError as e:
             raise click.Abort from e
-    try:
-        runner.run(('bash', '-c', 'command -v eix-sync'), stdout=sp.PIPE)
-    except sp.CalledProcessError as e:
+    if not which('eix-sync'):
         click.echo('You need to have app-portage/eix installed for this to work', err=True)
-        raise click.Abort from e
+        raise click.Abort
     sync_args = ('-a',) if debug else ('-a', '-q', '-H')
     try:
         runner.run(('eix-sync',) + sync_args, check=True)
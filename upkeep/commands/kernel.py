@@ -28,7 +28,7 @@ def kernel_command(func: Callable[[int | None], None]) -> click.BaseCommand:
     @click.option('-j',
                   '--number-of-jobs',
                   type=int,
-                  default=cpu_count() + 1,
+                  default=cpu_count(),
                   help='Number of tasks to run simultaneously')
     @umask(new_umask=0o022)
     def ret(number_of_jobs: int = 0) -> None:
@@ -3,7 +3,8 @@ from collections.abc import Mapping
 from typing import Final
 
 __all__ = ('CONFIG_GZ', 'DEFAULT_USER_CONFIG', 'DISABLE_GETBINPKG_ENV_DICT', 'GRUB_CFG', 'INTEL_UC',
-           'KERNEL_SOURCE_DIR', 'MINIMUM_ESELECT_LINES', 'OLD_KERNELS_DIR', 'SPECIAL_ENV')
+           'KERNEL_SOURCE_DIR', 'MINIMUM_ESELECT_LINES', 'OLD_KERNELS_DIR', 'PORTAGE_TMPDIR',
+           'SPECIAL_ENV')
 
 CONFIG_GZ: Final[str] = '/proc/config.gz'
 DEFAULT_USER_CONFIG: Final[str] = '/etc/upkeeprc'
@@ -14,6 +15,7 @@ GRUB_CFG: Final[str] = '/boot/grub/grub.cfg'
 INTEL_UC: Final[str] = '/boot/intel-uc.img'
 KERNEL_SOURCE_DIR: Final[str] = '/usr/src/linux'
 OLD_KERNELS_DIR: Final[str] = '/var/lib/upkeep/old-kernels'
+PORTAGE_TMPDIR: Final[str] = '/var/tmp/portage'
 SPECIAL_ENV: Final[tuple[str, ...]] = ('CONFIG_PROTECT', 'CONFIG_PROTECT_MASK', 'FEATURES', 'HOME',
                                        'LANG', 'MAKEOPTS', 'PATH', 'PORTAGE_COMPRESSION_COMMAND',
                                        'SHELL', 'SSH_AGENT_PID', 'SSH_AUTH_SOCK', 'TERM', 'USE')
@@ -5,6 +5,7 @@ from os import environ
 from shlex import quote
 from subprocess import CompletedProcess
 from typing import cast
+import shutil
 import subprocess as sp
 
 from loguru import logger
@@ -21,6 +22,12 @@ def minenv() -> Mapping[str, str]:
     return env
 
 
+@lru_cache
+def which(cmd: str) -> str | None:
+    """Cached :py:func:`shutil.which`. ``PATH`` is not expected to change during a run."""
+    return shutil.which(cmd)
+
+
 class CommandRunner:
     def run(self,
             args: Sequence[str],
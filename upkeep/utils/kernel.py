@@ -1,11 +1,11 @@
 # SPDX-License-Identifier: MIT
-from contextlib import ExitStack
 from multiprocessing import cpu_count
 from os import chdir
 from pathlib import Path
 from shlex import quote
 import gzip
 import re
+import shutil
 import subprocess as sp
 
 from loguru import logger
@@ -17,6 +17,25 @@ from . import CommandRunner
 
 __all__ = ('rebuild_kernel', 'upgrade_kernel')
 
+_INDEX_RE = re.compile(r'^\[([0-9]+)\]')
+_SELECTED_RE = re.compile(r'\*$')
+
+
+def _config_is_current() -> bool:
+    """
+    Checks if ``.config`` in the current directory was already processed by Kconfig.
+
+    This is the case when ``include/config/auto.conf`` is newer than ``.config`` and every
+    ``Kconfig*`` file in the tree.
+    """
+    try:
+        auto_conf_mtime = Path('include/config/auto.conf').stat().st_mtime
+        if auto_conf_mtime < Path('.config').stat().st_mtime:
+            return False
+        return all(p.stat().st_mtime <= auto_conf_mtime for p in Path().rglob('Kconfig*'))
+    except FileNotFoundError:
+        return False
+
 
 def rebuild_kernel(num_cpus: int | None = None) -> None:
     """
@@ -26,11 +45,12 @@ def rebuild_kernel(num_cpus: int | None = None) -> None:
 
     - Checks for a kernel configuration in ``/usr/src/linux/.config`` or
       ``/proc/config.gz``
-    - ``make oldconfig``
-    - ``make``
+    - ``make oldconfig`` (skipped if the configuration is current)
+    - ``make`` with ``-j`` set to ``num_cpus`` and ``-l`` (load average) to ``num_cpus + 1``
     - ``make modules_install``
     - ``make install``
-    - ``emerge --usepkg=n @module-rebuild @x11-module-rebuild``
+    - ``emerge --usepkg=n @module-rebuild @x11-module-rebuild`` (with ``--jobs`` set to half of
+      ``num_cpus``)
 
     The expectation is that your configuration for installkernel will set up booting from the new
     kernel (updating systemd-boot, etc).
@@ -53,21 +73,27 @@ def rebuild_kernel(num_cpus: int | None = None) -> None:
     upgrade_kernel
     """
     if not num_cpus:
-        num_cpus = cpu_count() + 1
+        num_cpus = cpu_count()
     chdir(KERNEL_SOURCE_DIR)
     dot_config_exists = Path('.config').is_file()
     if not dot_config_exists and Path(CONFIG_GZ).is_file():
-        with ExitStack() as stack:
-            stack.enter_context(open('.config', 'wb+')).write(
-                stack.enter_context(gzip.open(CONFIG_GZ)).read())
+        with open('.config', 'wb+') as f, gzip.open(CONFIG_GZ) as z:
+            shutil.copyfileobj(z, f)
     if not dot_config_exists:
         raise KernelConfigMissing
     runner = CommandRunner()
-    logger.info('Running: make oldconfig')
-    runner.check_call(('make', 'oldconfig'))
-    commands: tuple[tuple[str, ...], ...] = (('make', f'-j{num_cpus}'), ('make', 'modules_install'),
-                                             ('emerge', '--keep-going', '@module-rebuild',
-                                              '@x11-module-rebuild'), ('make', 'install'))
+    if _config_is_current():
+        logger.info('Kernel configuration is current. Not running make oldconfig.')
+    else:
+        logger.info('Running: make oldconfig')
+        runner.check_call(('make', 'oldconfig'))
+    commands: tuple[tuple[str, ...], ...] = (
+        ('make', f'-j{num_cpus}', f'-l{num_cpus + 1}'),
+        ('make', 'modules_install'),
+        ('emerge', '--keep-going', f'--jobs={max(1, num_cpus // 2)}', '@module-rebuild',
+         '@x11-module-rebuild'),
+        ('make', 'install'),
+    )
     for cmd in commands:
         logger.info(f'Running: {" ".join(quote(c) for c in cmd)}')
         runner.suppress_output(cmd)
@@ -96,23 +122,22 @@ def upgrade_kernel(num_cpus: int | None = None, fatal: bool | None = True) -> No
     """
     runner = CommandRunner()
     kernel_list = runner.run(('eselect', '--colour=no', 'kernel', 'list'), stdout=sp.PIPE)
-    lines = (s.strip() for s in kernel_list.stdout.splitlines() if s)
-    if not any(re.search(r'\*$', line) for line in lines):
+    lines = [s.strip() for s in kernel_list.stdout.splitlines() if s]
+    selected = next((i for i, line in enumerate(lines) if _SELECTED_RE.search(line)), None)
+    if selected is None:
         logger.info('Select a kernel to upgrade to (eselect kernel set ...).')
         if fatal:
             raise click.Abort
         return
-    if (len([
-            s for s in runner.run(('eselect', '--colour=no', '--brief', 'kernel', 'list'),
-                                  stdout=sp.PIPE).stdout.splitlines() if s
-    ]) > MINIMUM_ESELECT_LINES):
-        logger.info('Unexpected number of lines (eselect --brief). Not updating kernel.')
+    if len([line for line in lines if _INDEX_RE.match(line)]) > MINIMUM_ESELECT_LINES:
+        logger.info('Unexpected number of kernels (eselect kernel list). Not updating kernel.')
         if fatal:
             raise click.Abort
         return
     unselected = None
-    for line in (x for x in lines if not x.endswith('*')):
-        if m := re.search(r'^\[([0-9]+)\]', line):
+    # The kernel to upgrade to must be listed after the currently selected kernel
+    for line in lines[selected + 1:]:
+        if m := _INDEX_RE.match(line):
             unselected = int(m.group(1))
             break
     if not unselected: